@@ -1,12 +1,100 @@
 # auth.py
+import base64
+import gc
+import json
+import time
 import streamlit as st
 from firebase_setup import auth
 from streamlit_cookies_manager import EncryptedCookieManager
 
-# Browser cookie manager to store refresh token securely
-cookies = EncryptedCookieManager(prefix="legal_analyzer", password="super_secret_key")
-if not cookies.ready():
-    st.stop()
+class _BatchedCookies:
+    """Cookie manager wrapper that saves at most once per flush, and only if something changed.
+
+    Every save() re-encrypts the cookies and round-trips through the browser
+    component, so callers assign all keys first and then call flush().
+    """
+
+    def __init__(self, cookies):
+        self._cookies = cookies
+        self._dirty = False
+
+    def get(self, key, default=None):
+        return self._cookies.get(key, default)
+
+    def __getitem__(self, key):
+        return self._cookies[key]
+
+    def __setitem__(self, key, value):
+        if self._cookies.get(key) != value:
+            self._cookies[key] = value
+            self._dirty = True
+
+    def flush(self):
+        if self._dirty:
+            self._cookies.save()
+            self._dirty = False
+
+def _get_cookies():
+    """Return this browser session's cookie manager, built once per session.
+
+    Building the manager derives its Fernet key from the password (PBKDF2),
+    so it is kept in session_state instead of being recreated. It is not
+    shared via st.cache_resource because each manager holds one browser's cookies.
+    """
+    cookies = st.session_state.get("_cookies")
+    if cookies is None:
+        # Browser cookie manager to store refresh token securely
+        manager = EncryptedCookieManager(prefix="legal_analyzer", password="super_secret_key")
+        if not manager.ready():
+            st.stop()
+        cookies = st.session_state["_cookies"] = _BatchedCookies(manager)
+    return cookies
+
+# Per-user session_state entries, some holding whole analyses, dropped on logout
+_SESSION_KEYS_TO_CLEAR = ("user", "_cached_analysis", "generated_reports")
+
+# Refresh the ID token once it has less than this many seconds left
+TOKEN_REFRESH_MARGIN = 120
+
+def _token_exp(id_token):
+    """Read the expiry time (epoch seconds) from the payload of a Firebase ID token"""
+    payload = id_token.split(".")[1]
+    return json.loads(base64.urlsafe_b64decode(payload + "=="))["exp"]
+
+def _token_expiring(user, id_token):
+    """True if the ID token is missing, malformed or about to expire"""
+    # The decoded expiry is kept on the user dict next to the token it belongs to,
+    # so repeated calls between refreshes skip the base64/JSON decode
+    cached = user.get("_idTokenExp")
+    if cached and cached[0] == id_token:
+        exp = cached[1]
+    else:
+        try:
+            exp = _token_exp(id_token)
+        except (AttributeError, IndexError, KeyError, ValueError):
+            return True
+        user["_idTokenExp"] = (id_token, exp)
+    return exp - time.time() < TOKEN_REFRESH_MARGIN
+
+def get_fresh_id_token(user, force=False):
+    """Return a usable ID token for `user`, refreshing it only when needed.
+
+    Call this right before an outbound Firebase request instead of refreshing
+    on every rerun. The new ID token is written back into `user` (normally
+    st.session_state["user"]) and the rotated refresh token into the cookie.
+    """
+    id_token = user.get("idToken")
+    if not force and not _token_expiring(user, id_token):
+        return id_token
+    cookies = _get_cookies()
+    refresh_token = cookies.get("refreshToken")
+    if not refresh_token:
+        return id_token
+    refreshed = auth.refresh(refresh_token)
+    user["idToken"] = refreshed["idToken"]
+    cookies["refreshToken"] = refreshed["refreshToken"]
+    cookies.flush()
+    return user["idToken"]
 
 # ------------------- Authentication Functions ------------------- #
 def login():
@@ -21,8 +109,9 @@ def login():
             local_id = user["localId"]
 
             # Save refresh token in browser cookie
+            cookies = _get_cookies()
             cookies["refreshToken"] = refresh_token
-            cookies.save()
+            cookies.flush()
 
             # Save user in session state with localId
             st.session_state["user"] = {"email": email, "idToken": id_token, "localId": local_id}
@@ -45,9 +134,16 @@ def register():
             st.error("Registration failed. Try a different email.")
 
 def load_session():
-    """Restore user from browser cookie if refresh token exists."""
-    if "user" in st.session_state:
-        return  # already loaded
+    """Restore user from browser cookie if refresh token exists.
+
+    Once a user is loaded this makes no network calls; the ID token is
+    refreshed lazily by get_fresh_id_token() when Firebase is actually used.
+    The cookie is only checked once per browser session.
+    """
+    if st.session_state.get("user") or st.session_state.get("_session_checked"):
+        return  # already loaded, or already found nothing to restore
+    cookies = _get_cookies()
+    st.session_state["_session_checked"] = True
     refresh_token = cookies.get("refreshToken")
     if refresh_token:
         try:
@@ -65,17 +161,20 @@ def load_session():
 
             # Update cookie with new refresh token
             cookies["refreshToken"] = new_refresh
-            cookies.save()
+            cookies.flush()
         except Exception:
             # Invalid token, clear cookie
             cookies["refreshToken"] = ""
-            cookies.save()
+            cookies.flush()
 
 def logout():
     """Logout user, clear session and cookies."""
-    if "user" in st.session_state:
-        del st.session_state["user"]
+    # Streamlit never frees session_state by itself, so drop heavy entries here
+    for key in _SESSION_KEYS_TO_CLEAR:
+        st.session_state.pop(key, None)
+    gc.collect()
+    cookies = _get_cookies()
     cookies["refreshToken"] = ""
-    cookies.save()
+    cookies.flush()
     st.success("Logged out successfully!")
     st.rerun()
\ No newline at end of file
@@ -0,0 +1 @@
+# Lets tests import the app modules (nlp_utils, pdf_utils, ...) from the repo root
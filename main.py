@@ -1,28 +1,50 @@
+import hashlib
+import io
+import logging
+import os
 import time
+from collections import defaultdict
+from itertools import chain
 import streamlit as st
-from typing import Dict, Any
-
-from models import load_models
-from nlp_utils import (
-    preprocess_text, segment_clauses, classify_clause,
-    extract_important_points, extract_obligations,
-    summarize_clause, extract_dates, extract_document_info,
-    format_document_analysis, format_dates_section, 
-    format_obligations_section, create_executive_summary
-)
-from pdf_utils import extract_text_from_pdf
+from typing import Dict, Any, Iterator
+
+# models, nlp_utils and pdf_utils pull in spaCy and pypdfium2, so they are imported
+# where first needed; logging in or browsing saved files never loads them
 from auth import login, register, logout, load_session
-from save_analysis import save_analysis, get_saved_analyses
+from save_analysis import save_analysis, get_saved_analyses, fetch_saved_analyses, get_user_id
+
+logger = logging.getLogger(__name__)
 
 # ---------------- Load user session on reload ---------------- #
 load_session()
 
-def analyze_document(text: str, models) -> Dict[str, Any]:
+# Clauses per nlp.pipe batch; larger batches trade memory for throughput
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", 32))
+# Skip the trained spaCy components and use the rule-based extractors only;
+# much faster on large documents, but obligations are no longer tied to a party.
+# The pipeline is then never loaded, only a blank tokenizer
+LAZY_SPACY = os.getenv("LAZY_SPACY", "0") == "1"
+
+def analyze_document_stream(text: str, models, lazy_spacy: bool = LAZY_SPACY) -> Iterator[Dict[str, Any]]:
+    """Analyze a document clause by clause.
+
+    Yields the analysis dict once the document-level fields are filled in, and
+    again after each clause is appended, so callers can show clauses as they finish.
+    all_dates and all_obligations are filled in by the last yield.
+    With lazy_spacy, clauses are only tokenized and the regex-based extractors are used.
+    """
+    from nlp_utils import (
+        preprocess_text, segment_clauses, classify_clause, classify_clauses_batch,
+        extract_important_points, extract_obligations,
+        summarize_clauses, extract_dates, extract_document_info, parse_texts, tokenize_texts
+    )
+    from models import SPACY_N_PROCESS
+
     nlp, classifier_tokenizer, classifier_model, summarizer, ner_pipeline = models
     text = preprocess_text(text)
     
     # Extract document information
-    document_info = extract_document_info(text, nlp)
+    document_info = extract_document_info(text, nlp, lazy_spacy=lazy_spacy)
     
     doc_info = {
         "document_info": document_info,
@@ -34,25 +56,39 @@ def analyze_document(text: str, models) -> Dict[str, Any]:
         "all_dates": [],
         "all_obligations": {}
     }
+    date_lists = []
+    all_obligations = defaultdict(list)
+    yield doc_info
     
-    clauses = segment_clauses(text)
-    for title, clause_text in clauses:
-        if not clause_text.strip() or len(clause_text.split()) < 5:
-            continue
+    # First pass: drop empty/trivial clauses so the rest can be batched
+    clauses = [(title, clause_text) for title, clause_text, word_count in segment_clauses(text)
+               if word_count >= 5]
+    clause_texts = [clause_text for _, clause_text in clauses]
+    summaries = summarize_clauses(clause_texts, summarizer)
+    predicted_classes = [None] * len(clause_texts)
+    if classifier_tokenizer and classifier_model:
+        try:
+            predicted_classes = classify_clauses_batch(clause_texts, classifier_tokenizer, classifier_model)
+        except Exception as e:
+            logger.warning("Batch classification failed: %s", e)
+    # Parse every clause once, in batches, and share the Doc between the extractors
+    if lazy_spacy:
+        docs = tokenize_texts(clause_texts, nlp, batch_size=SPACY_BATCH_SIZE)
+    else:
+        docs = parse_texts(clause_texts, nlp, batch_size=SPACY_BATCH_SIZE, n_process=SPACY_N_PROCESS)
+
+    for (title, clause_text), summary, predicted_class, doc in zip(clauses, summaries, predicted_classes, docs):
         try:
-            # Enhanced classification with explanations
-            classification = classify_clause(clause_text, classifier_tokenizer, classifier_model)
-            important_points = extract_important_points(clause_text, nlp)
-            obligations = extract_obligations(clause_text, nlp)
-            summary = summarize_clause(clause_text, summarizer)
-            dates = extract_dates(clause_text, nlp)
+            # Enhanced classification with explanations; the model already ran in batch above
+            classification = classify_clause(clause_text, predicted_class=predicted_class)
+            important_points = extract_important_points(doc)
+            obligations = extract_obligations(doc)
+            dates = extract_dates(doc)
 
             # Collect all dates and obligations
-            doc_info["all_dates"].extend(dates)
+            date_lists.append(dates)
             for party, party_obligations in obligations.items():
-                if party not in doc_info["all_obligations"]:
-                    doc_info["all_obligations"][party] = []
-                doc_info["all_obligations"][party].extend(party_obligations)
+                all_obligations[party].extend(party_obligations)
 
             doc_info["clauses"].append({
                 "title": title,
@@ -63,96 +99,219 @@ def analyze_document(text: str, models) -> Dict[str, Any]:
                 "dates": dates,
                 "full_text": clause_text[:1000]
             })
-        except Exception as e:
-            print(f"Error processing clause {title}: {e}")
+        except Exception:
+            logger.exception("Error processing clause %s", title)
             continue
+        yield doc_info
+
+    # Document-wide summaries are only read once every clause is in
+    doc_info["all_dates"] = list(chain.from_iterable(date_lists))
+    doc_info["all_obligations"] = dict(all_obligations)
+    yield doc_info
+
+def analyze_document(text: str, models, lazy_spacy: bool = LAZY_SPACY) -> Dict[str, Any]:
+    """Analyze a whole document and return the finished analysis dict"""
+    for doc_info in analyze_document_stream(text, models, lazy_spacy=lazy_spacy):
+        pass
     return doc_info
 
+@st.cache_data(show_spinner=False, max_entries=16)
+def _extract_pdf_text(pdf_bytes: bytes) -> str:
+    """Extract PDF text, cached on the file bytes so reruns and re-uploads skip parsing"""
+    from pdf_utils import extract_text_from_pdf
+    return extract_text_from_pdf(io.BytesIO(pdf_bytes))
+
+# Saved reports shown per page in "See Saved Files"
+SAVED_PAGE_SIZE = 10
+# Generated reports kept per session; the oldest are dropped first
+MAX_GENERATED_REPORTS = 5
+
+def _store_report(analysis_key: str, report: Dict[str, Any]):
+    """Keep a generated report in session_state, bounding how many a session holds"""
+    reports = st.session_state["generated_reports"]
+    reports.pop(analysis_key, None)
+    reports[analysis_key] = report
+    while len(reports) > MAX_GENERATED_REPORTS:
+        reports.pop(next(iter(reports)))
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _fetch_saved_analyses(user_id: str, generation: int, _id_token: str) -> list:
+    """Cached database read; failures raise, so an error is never cached as an empty list"""
+    return fetch_saved_analyses(user_id, _id_token)
+
+@st.cache_resource
+def _saved_generations() -> Dict[str, int]:
+    """Per-user save markers shared by every session, so a save reaches the user's other tabs too"""
+    return {}
+
+def _saved_analyses(user) -> list:
+    """Fetch a user's saved analyses, cached briefly so reruns don't hit Firebase again.
+
+    Token refresh writes the auth cookie through a widget, so it runs in
+    get_saved_analyses before the cached read rather than inside it.
+    """
+    generations = _saved_generations()
+    return get_saved_analyses(
+        user, fetch=lambda user_id, token: _fetch_saved_analyses(user_id, generations.get(user_id, 0), token)
+    )
+
+def _invalidate_saved_analyses(user_id: str):
+    """Make every session's next listing for user_id skip the cache; other users' entries are left alone"""
+    # A clock reading always differs from the one it replaces, so two tabs saving
+    # at once can't both land on the same value the way a += count could
+    _saved_generations()[user_id] = time.monotonic_ns()
+
 # ---------------- Streamlit UI ---------------- #
+# Fragments rerun on their own when their widgets change, so toggling one
+# clause or pressing a report button doesn't rerun the whole page
+@st.fragment
+def render_clause(clause):
+    # Handle both old and new classification formats
+    clause_type = "Unknown"
+    if isinstance(clause.get('classification'), dict):
+        clause_type = clause['classification'].get('type', 'Unknown')
+        confidence = clause['classification'].get('confidence', 'Low')
+        explanation = clause['classification'].get('explanation', '')
+    elif 'type' in clause:
+        clause_type = clause['type']
+        confidence = "N/A"
+        explanation = ""
+    
+    with st.expander(f"{clause['title']} - {clause_type}"):
+        # Show classification details if available
+        if isinstance(clause.get('classification'), dict):
+            st.write(f"**Classification**: {clause_type} (Confidence: {confidence})")
+            if explanation:
+                st.write(f"**Explanation**: {explanation}")
+        
+        st.write(f"**Summary**: {clause['summary']}")
+
+        if clause["important_points"]:
+            st.write("**Important Points**:")
+            for point in clause["important_points"]:
+                st.write(f"- {point}")
+
+        if clause["obligations"]:
+            st.write("**Obligations**:")
+            for party, obligations in clause["obligations"].items():
+                st.write(f"*{party}*:")
+                for obl in obligations:
+                    st.write(f"  - {obl}")
+
+        if clause["dates"]:
+            st.write("**Important Dates in this Clause**:")
+            for date in clause["dates"]:
+                if isinstance(date, dict):
+                    st.write(f"- **{date['date']}**: {date['context']}")
+                else:
+                    st.write(f"- {date}")
+
+        if st.checkbox(f"Show full text for {clause['title']}", key=clause["title"]):
+            st.text(clause["full_text"])
+
+@st.fragment
+def render_report_actions(report_data):
+    # Create columns for download and save buttons
+    col1, col2 = st.columns(2)
+
+    with col1:
+        # Download button for report
+        if report_data.get("is_basic"):
+            st.download_button(
+                label="📥 Download Basic Report",
+                data=report_data["full_report"],
+                file_name="basic_legal_analysis.txt",
+                mime="text/plain",
+                key="download_basic_btn"
+            )
+        else:
+            st.download_button(
+                label="📥 Download Report as Text File",
+                data=report_data["full_report"],
+                file_name="legal_document_analysis.txt",
+                mime="text/plain",
+                key="download_full_btn"
+            )
+
+    with col2:
+        # Save button for logged-in users only
+        if st.session_state.get("user"):
+            save_key = "save_basic_report_stored" if report_data.get("is_basic") else "save_comprehensive_report_stored"
+            save_label = "💾 Save Basic Report" if report_data.get("is_basic") else "💾 Save Report to My Account"
+
+            if st.button(save_label, key=save_key):
+                logger.debug("Attempting to save %s report...", "basic" if report_data.get("is_basic") else "comprehensive")
+                try:
+                    save_analysis(st.session_state["user"], report_data["analysis"], report_data["full_report"])
+                    _invalidate_saved_analyses(get_user_id(st.session_state["user"]))
+                    st.success("✅ Report saved to your account!")
+                except Exception as e:
+                    logger.error("Error saving report: %s", e)
+                    st.error(f"❌ Error saving report: {e}")
+        else:
+            st.info("🔒 Login to save reports to your account")
+
 def main_app():
     st.title("Legal Document Analyzer")
     st.write("Upload a legal document (PDF or text) to analyze its contents")
 
-    models = load_models()
     uploaded_file = st.file_uploader("Choose a file", type=["pdf", "txt"])
 
     if uploaded_file:
         if uploaded_file.type == "application/pdf":
-            text = extract_text_from_pdf(uploaded_file)
+            with st.spinner("Extracting text from PDF..."):
+                text = _extract_pdf_text(uploaded_file.getvalue())
         else:
             text = uploaded_file.read().decode("utf-8")
 
-        with st.spinner("Analyzing document..."):
-            analysis = analyze_document(text, models)
-
-        st.success("Analysis complete!")
-
-        st.subheader("Document Overview")
-        
-        # Display document information if available
-        if "document_info" in analysis:
-            doc_info = analysis["document_info"]
-            st.write(f"**Document Title**: {doc_info['title']}")
-            st.write(f"**Document Type**: {doc_info['type']}")
-            st.write(f"**Purpose**: {doc_info['purpose']}")
-            st.write("---")
-        
-        st.write(f"**Length**: {analysis['metadata']['length']} characters")
-        st.write(f"**Number of clauses**: {len(analysis['clauses'])}")
-
-        # Show enhanced dates section if available
-        if "all_dates" in analysis and analysis["all_dates"]:
-            st.subheader("Important Dates & Deadlines")
-            for date_info in analysis["all_dates"]:
-                if isinstance(date_info, dict):
-                    st.write(f"📅 **{date_info['date']}**: {date_info['context']}")
-                else:
-                    st.write(f"📅 {date_info}")
+        status = st.empty()
+        # Filled in once all clauses are known, but shown above the breakdown
+        overview = st.container()
 
         st.subheader("Clause Breakdown")
-        for clause in analysis["clauses"]:
-            # Handle both old and new classification formats
-            clause_type = "Unknown"
-            if isinstance(clause.get('classification'), dict):
-                clause_type = clause['classification'].get('type', 'Unknown')
-                confidence = clause['classification'].get('confidence', 'Low')
-                explanation = clause['classification'].get('explanation', '')
-            elif 'type' in clause:
-                clause_type = clause['type']
-                confidence = "N/A"
-                explanation = ""
+        # Reuse this session's last analysis if the same document is still loaded
+        text_hash = hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+        cached = st.session_state.get("_cached_analysis")
+        if cached and cached["hash"] == text_hash:
+            analysis = cached["analysis"]
+            for clause in analysis["clauses"]:
+                render_clause(clause)
+        else:
+            status.info("Analyzing document...")
+            # spaCy is imported and loaded here, the first time a new document is analyzed
+            from models import load_models
+            models = load_models(lazy_spacy=LAZY_SPACY)
+            rendered = 0
+            for analysis in analyze_document_stream(text, models):
+                for clause in analysis["clauses"][rendered:]:
+                    render_clause(clause)
+                rendered = len(analysis["clauses"])
+            st.session_state["_cached_analysis"] = {"hash": text_hash, "analysis": analysis}
+
+        status.success("Analysis complete!")
+
+        with overview:
+            st.subheader("Document Overview")
             
-            with st.expander(f"{clause['title']} - {clause_type}"):
-                # Show classification details if available
-                if isinstance(clause.get('classification'), dict):
-                    st.write(f"**Classification**: {clause_type} (Confidence: {confidence})")
-                    if explanation:
-                        st.write(f"**Explanation**: {explanation}")
-                
-                st.write(f"**Summary**: {clause['summary']}")
-
-                if clause["important_points"]:
-                    st.write("**Important Points**:")
-                    for point in clause["important_points"]:
-                        st.write(f"- {point}")
-
-                if clause["obligations"]:
-                    st.write("**Obligations**:")
-                    for party, obligations in clause["obligations"].items():
-                        st.write(f"*{party}*:")
-                        for obl in obligations:
-                            st.write(f"  - {obl}")
-
-                if clause["dates"]:
-                    st.write("**Important Dates in this Clause**:")
-                    for date in clause["dates"]:
-                        if isinstance(date, dict):
-                            st.write(f"- **{date['date']}**: {date['context']}")
-                        else:
-                            st.write(f"- {date}")
-
-                if st.checkbox(f"Show full text for {clause['title']}", key=clause["title"]):
-                    st.text(clause["full_text"])
+            # Display document information if available
+            if "document_info" in analysis:
+                doc_info = analysis["document_info"]
+                st.write(f"**Document Title**: {doc_info['title']}")
+                st.write(f"**Document Type**: {doc_info['type']}")
+                st.write(f"**Purpose**: {doc_info['purpose']}")
+                st.write("---")
+            
+            st.write(f"**Length**: {analysis['metadata']['length']} characters")
+            st.write(f"**Number of clauses**: {len(analysis['clauses'])}")
+
+            # Show enhanced dates section if available
+            if "all_dates" in analysis and analysis["all_dates"]:
+                st.subheader("Important Dates & Deadlines")
+                for date_info in analysis["all_dates"]:
+                    if isinstance(date_info, dict):
+                        st.write(f"📅 **{date_info['date']}**: {date_info['context']}")
+                    else:
+                        st.write(f"📅 {date_info}")
 
         # Enhanced summary sections
         if "all_obligations" in analysis and analysis["all_obligations"]:
@@ -170,8 +329,9 @@ def main_app():
         if "generated_reports" not in st.session_state:
             st.session_state["generated_reports"] = {}
         
-        # Create a unique key for this analysis
-        analysis_key = f"analysis_{hash(str(analysis))}"
+        # Create a unique key for this analysis; the analysis is a function of the
+        # text, so its content hash identifies it without serializing the dict
+        analysis_key = f"analysis_{text_hash}"
         
         if st.button("Generate Comprehensive Report", key="generate_report_btn"):
             try:
@@ -197,11 +357,11 @@ def main_app():
                     )
                     
                     # Store reports in session state
-                    st.session_state["generated_reports"][analysis_key] = {
+                    _store_report(analysis_key, {
                         "executive_summary": executive_summary,
                         "full_report": full_report,
                         "analysis": analysis
-                    }
+                    })
                     
             except Exception as e:
                 st.error(f"Error generating report: {e}")
@@ -217,12 +377,12 @@ Clause Summary:
                 """
                 
                 # Store basic report in session state
-                st.session_state["generated_reports"][analysis_key] = {
+                _store_report(analysis_key, {
                     "executive_summary": "Basic report generated due to error",
                     "full_report": basic_report,
                     "analysis": analysis,
                     "is_basic": True
-                }
+                })
         
         # Display generated reports if they exist
         if analysis_key in st.session_state["generated_reports"]:
@@ -237,44 +397,58 @@ Clause Summary:
             else:
                 st.text_area("Full Professional Report", report_data["full_report"], height=400, key="full_report_display")
             
-            # Create columns for download and save buttons
-            col1, col2 = st.columns(2)
-            
+            render_report_actions(report_data)
+
+
+@st.fragment
+def render_saved_item(idx, item):
+    display_name = item.get("name", f"Analysis {idx}")
+    timestamp = item.get('timestamp')
+    if timestamp and isinstance(timestamp, (int, float)):
+        formatted_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+    else:
+        formatted_time = 'N/A'
+
+    with st.expander(f"📄 {display_name} (Saved: {formatted_time})"):
+
+        # Show document info
+        doc_info = item.get("document_info", {})
+        if doc_info:
+            st.write(f"**Document Title:** {doc_info.get('title', 'N/A')}")
+            st.write(f"**Document Type:** {doc_info.get('type', 'N/A')}")
+            st.write(f"**Purpose:** {doc_info.get('purpose', 'N/A')}")
+
+        # Show summary statistics
+        summary = item.get("summary", {})
+        if summary:
+            col1, col2, col3, col4 = st.columns(4)
             with col1:
-                # Download button for report
-                if report_data.get("is_basic"):
-                    st.download_button(
-                        label="📥 Download Basic Report",
-                        data=report_data["full_report"],
-                        file_name="basic_legal_analysis.txt",
-                        mime="text/plain",
-                        key="download_basic_btn"
-                    )
-                else:
-                    st.download_button(
-                        label="📥 Download Report as Text File",
-                        data=report_data["full_report"],
-                        file_name="legal_document_analysis.txt",
-                        mime="text/plain",
-                        key="download_full_btn"
-                    )
-            
+                st.metric("Clauses", summary.get("total_clauses", 0))
             with col2:
-                # Save button for logged-in users only
-                if st.session_state.get("user"):
-                    save_key = "save_basic_report_stored" if report_data.get("is_basic") else "save_comprehensive_report_stored"
-                    save_label = "💾 Save Basic Report" if report_data.get("is_basic") else "💾 Save Report to My Account"
-                    
-                    if st.button(save_label, key=save_key):
-                        print(f"Attempting to save {'basic' if report_data.get('is_basic') else 'comprehensive'} report...")
-                        try:
-                            save_analysis(st.session_state["user"], report_data["analysis"], report_data["full_report"])
-                            st.success("✅ Report saved to your account!")
-                        except Exception as e:
-                            print(f"Error saving report: {e}")
-                            st.error(f"❌ Error saving report: {e}")
-                else:
-                    st.info("🔒 Login to save reports to your account")
+                st.metric("Dates", summary.get("total_dates", 0))
+            with col3:
+                st.metric("Parties", summary.get("total_parties", 0))
+            with col4:
+                st.metric("Length", f"{summary.get('document_length', 0):,} chars")
+
+        # Show the final report
+        if item.get("final_report"):
+            st.subheader("📋 Final Analysis Report")
+            st.text_area("Report Content", item["final_report"], height=400, key=f"report_{idx}")
+
+            # Download button for saved report
+            st.download_button(
+                label="📥 Download This Report",
+                data=item["final_report"],
+                file_name=f"{display_name}_report.txt",
+                mime="text/plain",
+                key=f"download_{idx}"
+            )
+        elif item.get("basic_summary"):
+            st.subheader("📝 Analysis Summary")
+            st.text_area("Summary", item["basic_summary"], height=200, key=f"summary_{idx}")
+        else:
+            st.warning("⚠️ No final report available for this analysis. This might be an older save format.")
 
 
 def sidebar_auth():
@@ -316,60 +490,21 @@ def sidebar_auth():
 
     elif page == "See Saved Files":
         user_email = st.session_state["user"].get("email", "Unknown")
-        saved = get_saved_analyses(st.session_state["user"])
+        user = st.session_state["user"]
+        saved = _saved_analyses(user)
         st.header("📁 Your Saved Analysis Reports")
         
         if saved:
             st.write(f"Found {len(saved)} saved report(s)")
             
-            for idx, item in enumerate(saved, 1):
-                display_name = item.get("name", f"Analysis {idx}")
-                timestamp = item.get('timestamp')
-                if timestamp and isinstance(timestamp, (int, float)):
-                    formatted_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
-                else:
-                    formatted_time = 'N/A'
-                
-                with st.expander(f"📄 {display_name} (Saved: {formatted_time})"):
-                    
-                    # Show document info
-                    doc_info = item.get("document_info", {})
-                    if doc_info:
-                        st.write(f"**Document Title:** {doc_info.get('title', 'N/A')}")
-                        st.write(f"**Document Type:** {doc_info.get('type', 'N/A')}")
-                        st.write(f"**Purpose:** {doc_info.get('purpose', 'N/A')}")
-                    
-                    # Show summary statistics
-                    summary = item.get("summary", {})
-                    if summary:
-                        col1, col2, col3, col4 = st.columns(4)
-                        with col1:
-                            st.metric("Clauses", summary.get("total_clauses", 0))
-                        with col2:
-                            st.metric("Dates", summary.get("total_dates", 0))
-                        with col3:
-                            st.metric("Parties", summary.get("total_parties", 0))
-                        with col4:
-                            st.metric("Length", f"{summary.get('document_length', 0):,} chars")
-                    
-                    # Show the final report
-                    if item.get("final_report"):
-                        st.subheader("📋 Final Analysis Report")
-                        st.text_area("Report Content", item["final_report"], height=400, key=f"report_{idx}")
-                        
-                        # Download button for saved report
-                        st.download_button(
-                            label="📥 Download This Report",
-                            data=item["final_report"],
-                            file_name=f"{display_name}_report.txt",
-                            mime="text/plain",
-                            key=f"download_{idx}"
-                        )
-                    elif item.get("basic_summary"):
-                        st.subheader("📝 Analysis Summary")
-                        st.text_area("Summary", item["basic_summary"], height=200, key=f"summary_{idx}")
-                    else:
-                        st.warning("⚠️ No final report available for this analysis. This might be an older save format.")
+            page_count = (len(saved) - 1) // SAVED_PAGE_SIZE + 1
+            page_number = 1
+            if page_count > 1:
+                page_number = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1, key="saved_page")
+            start = (page_number - 1) * SAVED_PAGE_SIZE
+            
+            for idx, item in enumerate(saved[start:start + SAVED_PAGE_SIZE], start + 1):
+                render_saved_item(idx, item)
         else:
             st.info("📭 No saved reports found. Analyze a document and save the final report to see it here.")
 
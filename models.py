@@ -1,14 +1,52 @@
+import logging
+import os
 import spacy
 import streamlit as st
 
+logger = logging.getLogger(__name__)
+
+# Package name or local directory of the spaCy pipeline. Pointing this at a
+# directory written once with nlp.to_disk() skips the package lookup at startup
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+# Worker processes for nlp.pipe, read by main.py too; each loads its own copy of the
+# model, so this only pays off for long documents on machines with spare cores.
+# Worker processes can't share a GPU-allocated pipeline, so more than one keeps spaCy on the CPU
+SPACY_N_PROCESS = int(os.getenv("SPACY_N_PROCESS", 1))
+
+def _is_path(name):
+    """True if a SPACY_MODEL value names a directory rather than an installed package"""
+    return os.path.isdir(name) or os.sep in name or bool(os.altsep and os.altsep in name)
+
 # Load models (do this once at startup)
 @st.cache_resource
-def load_models():
-    # SpaCy for basic NLP (this is all we have now without transformers)
+def load_models(lazy_spacy: bool = False):
+    """Load the NLP models once per process.
+
+    With lazy_spacy only a blank English tokenizer is built, since the lazy
+    analysis path never runs a trained component; the pipeline is not loaded.
+    """
+    if lazy_spacy:
+        logger.info("Lazy spaCy mode: using a blank English tokenizer, %s is not loaded", SPACY_MODEL)
+        return spacy.blank("en"), None, None, None, None
+
+    # Run on a GPU when one is available (needs cupy, see requirements.txt); stays on CPU otherwise
+    if SPACY_N_PROCESS > 1:
+        logger.info("SPACY_N_PROCESS=%d: running spaCy on the CPU with worker processes", SPACY_N_PROCESS)
+    elif spacy.prefer_gpu():
+        logger.info("Running spaCy on the GPU")
+    else:
+        logger.info("No GPU available, running spaCy on the CPU")
+    # SpaCy for basic NLP (this is all we have now without transformers).
+    # nlp_utils only needs: sentences and tok.dep_ (parser), ent_type_/ents (ner),
+    # and lexical attributes like lower_/is_upper (no component). POS tags and
+    # lemmas are never read, so skip the components that produce them.
     try:
-        nlp = spacy.load("en_core_web_sm")
+        nlp = spacy.load(SPACY_MODEL, disable=["tagger", "attribute_ruler", "lemmatizer"])
     except OSError:
-        st.error("SpaCy English model not found. Please install it with: python -m spacy download en_core_web_sm")
+        if _is_path(SPACY_MODEL):
+            st.error(f"SpaCy model directory '{SPACY_MODEL}' could not be loaded. Check that it was written with nlp.to_disk().")
+        else:
+            st.error(f"SpaCy model '{SPACY_MODEL}' not found. Please install it with: python -m spacy download {SPACY_MODEL}")
         st.stop()
     
     # Return None for the transformer models that are no longer available
@@ -1,115 +1,242 @@
 import re
-from typing import List, Dict
-import PyPDF2
-from collections import defaultdict
+import bisect
+import hashlib
+import logging
+import threading
+from typing import List, Dict, Tuple, Iterator
+from collections import Counter, defaultdict, OrderedDict
+from dateutil import parser as dateutil_parser
+import numpy as np
+import ahocorasick
+from spacy.attrs import LOWER, IS_UPPER, LENGTH
+from spacy.pipeline import Sentencizer
+from spacy.tokens import Doc
+
+logger = logging.getLogger(__name__)
+
+# Precompiled patterns shared by the helpers below
+_WS_RE = re.compile(r'\s+')
+# Citations like [1] and text in parentheses; negated classes stop at the first closer without backtracking
+_CLEAN_RE = re.compile(r'\[[^\]]*\]|\([^)]*\)')
+
+# Punctuation-based sentence splitter for paths that don't need the parser
+_SENTENCIZER = Sentencizer()
+
+# Organisation names for when no NER has run: capitalised words ending in a company suffix.
+# Articles, preamble words and headings are capitalised too but never part of a name,
+# so "WHEREAS The Company" or "Services Agreement The Company" don't count as one
+_ORG_STOPWORDS = (
+    "The", "This", "That", "These", "Those", "A", "An", "Each", "Any", "All", "Such",
+    "WHEREAS", "Whereas", "NOW", "Now", "THEREFORE", "Therefore", "Agreement", "AGREEMENT",
+    "Contract", "Services", "Service", "Terms", "Policy", "Company", "Party", "Parties",
+    "Section", "SECTION", "Article", "ARTICLE",
+)
+_ORG_WORD = r'(?!(?:' + '|'.join(_ORG_STOPWORDS) + r')\b)[A-Z][\w&-]*'
+_ORG_RE = re.compile(r'\b(?:' + _ORG_WORD + r'\s+){0,4}' + _ORG_WORD
+                     + r',?\s+(?:Inc|LLC|Ltd|LLP|PLC|Corp|Corporation|Company|GmbH)\b\.?')
+
+# Common legal document patterns, checked in order (first match wins)
+_DOC_TYPE_PATTERNS = {
+    'Terms of Service': re.compile(r'terms?\s+of\s+(service|use)', re.IGNORECASE),
+    'Privacy Policy': re.compile(r'privacy\s+policy', re.IGNORECASE),
+    'License Agreement': re.compile(r'license\s+agreement', re.IGNORECASE),
+    'Service Agreement': re.compile(r'service\s+agreement', re.IGNORECASE),
+    'Terms and Conditions': re.compile(r'terms?\s+and\s+conditions', re.IGNORECASE),
+    'User Agreement': re.compile(r'user\s+agreement', re.IGNORECASE),
+    'Contract': re.compile(r'contract|agreement', re.IGNORECASE),
+    'Policy': re.compile(r'policy', re.IGNORECASE)
+}
 
 # Document preprocessing
 def preprocess_text(text: str) -> str:
     """Clean and normalize document text"""
-    # Remove excessive whitespace and newlines
-    text = re.sub(r'\s+', ' ', text).strip()
-    # Basic cleaning
-    text = re.sub(r'\[.*?\]', '', text)  # Remove citations like [1]
-    text = re.sub(r'\(.*?\)', '', text)  # Remove text in parentheses
-    return text
-
-# Extract text from PDF
-def extract_text_from_pdf(uploaded_file) -> str:
-    """Extract text content from PDF files"""
-    pdf_reader = PyPDF2.PdfReader(uploaded_file)
-    text = ""
-    for page in pdf_reader.pages:
-        text += page.extract_text()
-    return preprocess_text(text)
+    # Drop citations like [1] and parenthesised text, then collapse whitespace and newlines
+    return _WS_RE.sub(' ', _CLEAN_RE.sub('', text)).strip()
+
+# Serialized Docs of recently parsed texts, shared by all sessions in the process.
+# Bounded by entry count and by total serialized size, since one entry can be a whole contract
+_DOC_CACHE_SIZE = 512
+_DOC_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# No extractor reads the tok2vec tensor or user_data, and the tensor dominates the payload
+_DOC_CACHE_EXCLUDE = ["tensor", "user_data"]
+_doc_cache: "OrderedDict[bytes, bytes]" = OrderedDict()
+_doc_cache_bytes = 0
+_doc_cache_lock = threading.Lock()
+
+def parse_texts(texts: List[str], nlp, batch_size: int = 32, n_process: int = 1) -> Iterator[Doc]:
+    """Parse texts with nlp.pipe, reusing cached Docs for texts parsed before"""
+    global _doc_cache_bytes
+    keys = [hashlib.blake2b(text.encode(), digest_size=16).digest() for text in texts]
+    # Snapshot the hits first so evictions while parsing can't turn them into misses
+    with _doc_cache_lock:
+        hits = {}
+        for key in keys:
+            data = _doc_cache.get(key)
+            if data is not None:
+                hits[key] = data
+                _doc_cache.move_to_end(key)
+
+    parsed = nlp.pipe((text for text, key in zip(texts, keys) if key not in hits),
+                      batch_size=batch_size, n_process=n_process)
+    for key in keys:
+        if key in hits:
+            yield Doc(nlp.vocab).from_bytes(hits[key], exclude=_DOC_CACHE_EXCLUDE)
+            continue
+        doc = next(parsed)
+        data = doc.to_bytes(exclude=_DOC_CACHE_EXCLUDE)
+        if len(data) <= _DOC_CACHE_MAX_BYTES:
+            with _doc_cache_lock:
+                old = _doc_cache.pop(key, None)
+                if old is not None:
+                    _doc_cache_bytes -= len(old)
+                _doc_cache[key] = data
+                _doc_cache_bytes += len(data)
+                while len(_doc_cache) > _DOC_CACHE_SIZE or _doc_cache_bytes > _DOC_CACHE_MAX_BYTES:
+                    _, evicted = _doc_cache.popitem(last=False)
+                    _doc_cache_bytes -= len(evicted)
+        yield doc
+
+def tokenize_texts(texts: List[str], nlp, batch_size: int = 32) -> Iterator[Doc]:
+    """Tokenize texts and split sentences by punctuation, without running any trained component
+
+    The Docs carry lexical attributes (lower_, is_upper, ...) but no parse or entities,
+    so extract_dates falls back to its regex rules and obligations can't be tied to a party.
+    """
+    return _SENTENCIZER.pipe(nlp.tokenizer.pipe(texts, batch_size=batch_size), batch_size=batch_size)
+
+# Split by common legal document patterns
+_CLAUSE_SPLIT_RE = re.compile('|'.join([
+    r'\nSECTION\s+\d+[.:]',
+    r'\nArticle\s+\d+[.:]',
+    r'\n\d+\.\s',  # Numbered clauses
+    r'\n\([a-z]\)',  # Lettered sub-clauses
+    r'\nWHEREAS',  # Common contract preamble
+]))
 
 # Clause segmentation
-def segment_clauses(doc) -> List[str]:
-    """Split document into logical clauses/sections"""
+def segment_clauses(doc) -> List[Tuple[str, str, int]]:
+    """Split document into logical clauses/sections as (title, text, word_count) tuples"""
     clauses = []
-    current_clause = ""
-    
-    # Split by common legal document patterns
-    patterns = [
-        r'\nSECTION\s+\d+[.:]',
-        r'\nArticle\s+\d+[.:]',
-        r'\n\d+\.\s',  # Numbered clauses
-        r'\n\([a-z]\)',  # Lettered sub-clauses
-        r'\nWHEREAS',  # Common contract preamble
-    ]
-    
-    split_regex = re.compile('|'.join(patterns))
-    parts = split_regex.split(doc)
-    matches = split_regex.findall(doc)
-    
-    if len(parts) > 1:
-        # The first part is usually preamble
-        clauses.append(("Preamble", parts[0].strip()))
-        for i in range(1, len(parts)):
-            clause_title = matches[i-1].strip() if i <= len(matches) else f"Clause {i}"
-            clauses.append((clause_title, parts[i].strip()))
+    
+    # One scan yields both the headings and the spans between them.
+    # The first span is usually preamble
+    title, last = "Preamble", 0
+    for match in _CLAUSE_SPLIT_RE.finditer(doc):
+        body = doc[last:match.start()].strip()
+        clauses.append((title, body, len(body.split())))
+        title, last = match.group().strip(), match.end()
+    
+    if clauses:
+        body = doc[last:].strip()
+        clauses.append((title, body, len(body.split())))
     else:
         # Fallback: split by paragraphs
         paragraphs = [p.strip() for p in doc.split('\n') if p.strip()]
         for i, para in enumerate(paragraphs):
-            clauses.append((f"Paragraph {i+1}", para))
+            clauses.append((f"Paragraph {i+1}", para, len(para.split())))
     
     return clauses
 
 # Classify clause type
-def classify_clause(text: str, tokenizer=None, model=None) -> Dict[str, str]:
-    """Classify the type of legal clause using both ML and rule-based approaches"""
+# Keywords per clause category, in tie-breaking order
+_CLAUSE_KEYWORDS = {
+    "Definitions": ["definition", "means", "shall mean", "defined as", "refers to", "includes"],
+    "Obligations": ["shall", "must", "required to", "obligation", "duty", "responsible for"],
+    "Rights": ["right to", "entitled to", "may", "permitted to", "authorized"],
+    "Termination": ["terminate", "termination", "end", "expiry", "dissolution"],
+    "Confidentiality": ["confidential", "non-disclosure", "proprietary", "trade secret"],
+    "Payment Terms": ["payment", "fee", "cost", "price", "billing", "invoice"],
+    "Governing Law": ["governing law", "jurisdiction", "applicable law", "courts"],
+    "Liability": ["liable", "liability", "damages", "loss", "responsible for harm"],
+    "Data Protection": ["personal data", "privacy", "data protection", "information"],
+    "Intellectual Property": ["copyright", "trademark", "patent", "intellectual property"],
+    "Dispute Resolution": ["dispute", "arbitration", "mediation", "resolution"],
+    "Force Majeure": ["force majeure", "acts of god", "circumstances beyond control"],
+    "Miscellaneous": []
+}
+
+# All keywords go into one Aho-Corasick automaton so a clause is scanned once;
+# iter() reports overlapping hits, e.g. both "shall" and "shall mean"
+def _build_keyword_automaton() -> Tuple[Dict[str, List[str]], "ahocorasick.Automaton"]:
+    """Map each clause keyword to its categories and compile all keywords into one automaton"""
+    keyword_categories = defaultdict(list)
+    for category, keywords in _CLAUSE_KEYWORDS.items():
+        for keyword in keywords:
+            keyword_categories[keyword].append(category)
+
+    automaton = ahocorasick.Automaton()
+    for keyword in keyword_categories:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return keyword_categories, automaton
+
+_KEYWORD_CATEGORIES, _CLAUSE_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+# Shown next to each clause's category
+_EXPLANATIONS = {
+    "Definitions": "Contains definitions of terms used throughout the document",
+    "Obligations": "Specifies duties and requirements that parties must fulfill",
+    "Rights": "Outlines privileges and permissions granted to parties",
+    "Termination": "Describes conditions and procedures for ending the agreement",
+    "Confidentiality": "Addresses protection of sensitive information",
+    "Payment Terms": "Specifies financial obligations and payment procedures",
+    "Governing Law": "Establishes legal jurisdiction and applicable laws",
+    "Liability": "Addresses responsibility for damages or losses",
+    "Data Protection": "Covers handling and protection of personal information",
+    "Intellectual Property": "Addresses ownership and use of IP assets",
+    "Dispute Resolution": "Outlines procedures for resolving conflicts",
+    "Force Majeure": "Addresses unforeseeable circumstances beyond control",
+    "Miscellaneous": "General provisions that don't fit other categories"
+}
+
+# Label order of the fine-tuned clause classifier
+_ML_CLASS_MAPPING = {
+    0: "Definitions", 1: "Obligations", 2: "Rights", 3: "Termination",
+    4: "Confidentiality", 5: "Payment Terms", 6: "Governing Law",
+    7: "Liability", 8: "Data Protection", 9: "Miscellaneous"
+}
+
+def classify_clauses_batch(texts: List[str], tokenizer, model, batch_size: int = 16) -> List[int]:
+    """Predict a class label for every clause with padded, batched forward passes"""
+    import torch
+
+    model.eval()
+    labels = []
+    with torch.inference_mode():
+        for start in range(0, len(texts), batch_size):
+            inputs = tokenizer(texts[start:start + batch_size], return_tensors="pt",
+                               padding=True, truncation=True, max_length=512)
+            logits = model(**inputs).logits
+            labels.extend(logits.argmax(dim=-1).tolist())
+    return labels
+
+def classify_clause(text: str, tokenizer=None, model=None, predicted_class: int = None) -> Dict[str, str]:
+    """Classify the type of legal clause using both ML and rule-based approaches
+
+    predicted_class can be passed from classify_clauses_batch to skip the per-clause forward pass.
+    """
     
     # Rule-based classification as fallback or primary method
-    clause_keywords = {
-        "Definitions": ["definition", "means", "shall mean", "defined as", "refers to", "includes"],
-        "Obligations": ["shall", "must", "required to", "obligation", "duty", "responsible for"],
-        "Rights": ["right to", "entitled to", "may", "permitted to", "authorized"],
-        "Termination": ["terminate", "termination", "end", "expiry", "dissolution"],
-        "Confidentiality": ["confidential", "non-disclosure", "proprietary", "trade secret"],
-        "Payment Terms": ["payment", "fee", "cost", "price", "billing", "invoice"],
-        "Governing Law": ["governing law", "jurisdiction", "applicable law", "courts"],
-        "Liability": ["liable", "liability", "damages", "loss", "responsible for harm"],
-        "Data Protection": ["personal data", "privacy", "data protection", "information"],
-        "Intellectual Property": ["copyright", "trademark", "patent", "intellectual property"],
-        "Dispute Resolution": ["dispute", "arbitration", "mediation", "resolution"],
-        "Force Majeure": ["force majeure", "acts of god", "circumstances beyond control"],
-        "Miscellaneous": []
-    }
-    
-    text_lower = text.lower()
-    scores = {}
-    
-    # Calculate scores for each category
-    for category, keywords in clause_keywords.items():
-        score = sum(1 for keyword in keywords if keyword in text_lower)
-        if keywords:  # Don't score miscellaneous based on keywords
-            scores[category] = score
+    # Score each category by how many of its keywords occur, found in one automaton pass
+    found = {keyword for _, keyword in _CLAUSE_KEYWORD_AUTOMATON.iter(text.lower())}
+    # Seeded in table order so most_common breaks ties the same way
+    scores = Counter({category: 0 for category, keywords in _CLAUSE_KEYWORDS.items()
+                      if keywords})  # Don't score miscellaneous based on keywords
+    for keyword in found:
+        scores.update(_KEYWORD_CATEGORIES[keyword])
     
     # Get best match
-    if scores:
-        best_category = max(scores.items(), key=lambda x: x[1])
-        if best_category[1] > 0:
-            classification = best_category[0]
-        else:
-            classification = "Miscellaneous"
-    else:
-        classification = "Miscellaneous"
+    best_category, best_score = scores.most_common(1)[0]
+    classification = best_category if best_score > 0 else "Miscellaneous"
     
     # If model is available, use it for additional insight
     confidence = "Medium"
-    if tokenizer and model:
+    if predicted_class is not None or (tokenizer and model):
         try:
-            inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
-            outputs = model(**inputs)
-            predicted_class = outputs.logits.argmax().item()
+            if predicted_class is None:
+                predicted_class = classify_clauses_batch([text], tokenizer, model)[0]
             
-            class_mapping = {
-                0: "Definitions", 1: "Obligations", 2: "Rights", 3: "Termination",
-                4: "Confidentiality", 5: "Payment Terms", 6: "Governing Law",
-                7: "Liability", 8: "Data Protection", 9: "Miscellaneous"
-            }
-            
-            ml_classification = class_mapping.get(predicted_class, "Unknown")
+            ml_classification = _ML_CLASS_MAPPING.get(predicted_class, "Unknown")
             
             # Use ML result if it matches rule-based or if rule-based is uncertain
             if ml_classification == classification or classification == "Miscellaneous":
@@ -117,71 +244,68 @@ def classify_clause(text: str, tokenizer=None, model=None) -> Dict[str, str]:
                 confidence = "High"
                 
         except Exception as e:
-            print(f"ML classification failed: {e}")
+            logger.warning("ML classification failed: %s", e)
     
     # Add explanation
-    explanations = {
-        "Definitions": "Contains definitions of terms used throughout the document",
-        "Obligations": "Specifies duties and requirements that parties must fulfill",
-        "Rights": "Outlines privileges and permissions granted to parties",
-        "Termination": "Describes conditions and procedures for ending the agreement",
-        "Confidentiality": "Addresses protection of sensitive information",
-        "Payment Terms": "Specifies financial obligations and payment procedures",
-        "Governing Law": "Establishes legal jurisdiction and applicable laws",
-        "Liability": "Addresses responsibility for damages or losses",
-        "Data Protection": "Covers handling and protection of personal information",
-        "Intellectual Property": "Addresses ownership and use of IP assets",
-        "Dispute Resolution": "Outlines procedures for resolving conflicts",
-        "Force Majeure": "Addresses unforeseeable circumstances beyond control",
-        "Miscellaneous": "General provisions that don't fit other categories"
-    }
-    
     return {
         "type": classification,
         "confidence": confidence,
-        "explanation": explanations.get(classification, "General legal provision")
+        "explanation": _EXPLANATIONS.get(classification, "General legal provision")
     }
 
+# Words and phrases that mark a sentence as important
+_MODAL_WORDS = ("shall", "must", "will", "may not", "cannot")
+_LEGAL_PHRASES = ("hereby", "notwithstanding", "subject to", "in accordance with")
+_LEGAL_PHRASE_RE = re.compile('|'.join(map(re.escape, _LEGAL_PHRASES)), re.IGNORECASE)
+
 # Extract important points
-def extract_important_points(text: str, nlp) -> List[str]:
-    """Extract key sentences using linguistic features"""
-    doc = nlp(text)
+def extract_important_points(doc) -> List[str]:
+    """Extract key sentences from a parsed spaCy Doc using linguistic features"""
     important_points = []
+    sents = list(doc.sents)
+    if not sents:
+        return important_points
+    
+    # Token-level rules run as numpy masks over the Doc's attribute columns:
+    # modal verbs (shall, must, etc.) and defined terms (capitalized terms)
+    attrs = doc.to_array([LOWER, IS_UPPER, LENGTH])
+    modal_ids = np.array([doc.vocab.strings[word] for word in _MODAL_WORDS], dtype=attrs.dtype)
+    token_hits = np.isin(attrs[:, 0], modal_ids) | ((attrs[:, 1] == 1) & (attrs[:, 2] > 3))
+    sent_hits = np.logical_or.reduceat(token_hits, [sent.start for sent in sents])
+    
+    # Legal phrases, found in a single scan of the whole text and mapped back to their sentence
+    sent_starts = [sent.start_char for sent in sents]
+    for match in _LEGAL_PHRASE_RE.finditer(doc.text):
+        i = bisect.bisect_right(sent_starts, match.start()) - 1
+        if i >= 0 and match.end() <= sents[i].end_char:
+            sent_hits[i] = True
     
     # Rules for important sentences
-    for sent in doc.sents:
-        # Check for modal verbs (shall, must, etc.)
-        has_modal = any(tok.lower_ in ["shall", "must", "will", "may not", "cannot"] for tok in sent)
-        
-        # Check for legal phrases
-        legal_phrases = ["hereby", "notwithstanding", "subject to", "in accordance with"]
-        has_legal_phrase = any(phrase in sent.text.lower() for phrase in legal_phrases)
-        
-        # Check for defined terms (capitalized terms)
-        # has_defined_terms = any(tok.is_upper() and len(tok.text) > 3 for tok in sent)
-        has_defined_terms = any(tok.is_upper and len(tok.text) > 3 for tok in sent)
-
-        
-        if has_modal or has_legal_phrase or has_defined_terms:
+    for sent, is_important in zip(sents, sent_hits):
+        if is_important:
             important_points.append(sent.text.strip())
+            if len(important_points) == 5:  # Return top 5 important points
+                break
     
-    return important_points[:5]  # Return top 5 important points
+    return important_points
+
+# Modal verbs that mark a sentence as an obligation
+_OBLIGATION_MODALS = frozenset({"shall", "must"})
+# Dependency labels of the party an obligation applies to
+_OBLIGATION_DEPS = frozenset({"nsubj", "nsubjpass"})
 
 # Extract obligations
-def extract_obligations(text: str, nlp) -> Dict[str, List[str]]:
-    """Identify obligations for each party"""
-    doc = nlp(text)
+def extract_obligations(doc) -> Dict[str, List[str]]:
+    """Identify obligations for each party in a parsed spaCy Doc"""
     obligations = defaultdict(list)
     current_party = None
     
     for sent in doc.sents:
-        # Simple pattern matching for obligations
-        if "shall" in sent.text.lower() or "must" in sent.text.lower():
-            # Try to find the subject (party with obligation)
-            for tok in sent:
-                if tok.dep_ in ("nsubj", "nsubjpass") and tok.ent_type_ == "ORG":
-                    current_party = tok.text
-                    break
+        # Simple pattern matching for obligations on the tokens' lowercase forms
+        if any(tok.lower_ in _OBLIGATION_MODALS for tok in sent):
+            # Try to find the subject (party with obligation); keep the last party otherwise
+            current_party = next((tok.text for tok in sent
+                                  if tok.dep_ in _OBLIGATION_DEPS and tok.ent_type_ == "ORG"), current_party)
             
             if current_party:
                 obligations[current_party].append(sent.text.strip())
@@ -208,137 +332,159 @@ def summarize_clause(text: str, summarizer) -> str:
     else:
         return text[:150] + "..." if len(text) > 150 else text
 
+# Generation settings for the summarizer; greedy decoding keeps summaries deterministic
+SUMMARY_MAX_LENGTH = 130
+SUMMARY_MIN_LENGTH = 30
+
+def summarize_clauses(texts: List[str], summarizer=None, batch_size: int = 8) -> List[str]:
+    """Summarize a batch of clauses, running the summarizer once over all of them if loaded"""
+    summaries = [None] * len(texts)
+    # Short clauses are returned as-is by summarize_clause, so only batch the rest
+    long_indices = [i for i, text in enumerate(texts) if len(text.split()) >= 10]
+    if summarizer and long_indices:
+        try:
+            results = summarizer(
+                [texts[i] for i in long_indices], batch_size=batch_size, truncation=True,
+                max_length=SUMMARY_MAX_LENGTH, min_length=SUMMARY_MIN_LENGTH, do_sample=False
+            )
+            for i, result in zip(long_indices, results):
+                summaries[i] = result["summary_text"]
+        except Exception as e:
+            logger.warning("Batch summarization failed: %s", e)
+    return [summary if summary is not None else summarize_clause(text, summarizer)
+            for text, summary in zip(texts, summaries)]
+
 # Extract dates and deadlines
-def extract_dates(text: str, nlp) -> List[Dict[str, str]]:
-    """Extract important dates with context from text"""
-    if not nlp:
-        # Fallback regex-based extraction if no NLP model
-        return extract_dates_fallback(text)
+def extract_dates(doc) -> List[Dict[str, str]]:
+    """Extract important dates with context from a parsed spaCy Doc"""
+    if not doc.has_annotation("ENT_IOB"):
+        # Fallback regex-based extraction if the pipeline has no NER
+        return extract_dates_fallback(doc.text)
     
-    doc = nlp(text)
     dates = []
+    # Entities and sentences are both in document order, so walk them together
+    # instead of looking up ent.sent for every entity
+    sents = list(doc.sents)
+    sent_idx = 0
     
     for ent in doc.ents:
         if ent.label_ == "DATE":
-            # Get the sentence containing the date
-            sent = ent.sent
-            sentence_text = sent.text.strip()
+            # Get the sentence containing the date; Span.text builds a new string, so read it once
+            while ent.start >= sents[sent_idx].end:
+                sent_idx += 1
+            sent = sents[sent_idx]
+            raw_sentence = sent.text
+            sentence_text = raw_sentence.strip()
             
             # Extract better context by finding complete words around the date
             date_text = ent.text
             
-            # Find the position of the date in the sentence
-            date_pos = sentence_text.lower().find(date_text.lower())
-            
-            if date_pos != -1:
-                # Extract context with complete words (±5 words around the date)
-                words = sentence_text.split()
-                date_words = date_text.split()
-                
-                # Find the date position in word array
-                date_word_start = -1
-                for i, word in enumerate(words):
-                    if date_words[0].lower() in word.lower():
-                        # Check if this is the right match
-                        match_found = True
-                        for j, date_word in enumerate(date_words):
-                            if i + j >= len(words) or date_word.lower() not in words[i + j].lower():
-                                match_found = False
-                                break
-                        if match_found:
-                            date_word_start = i
-                            break
-                
-                if date_word_start != -1:
-                    # Extract 5 words before and after
-                    context_start = max(0, date_word_start - 5)
-                    context_end = min(len(words), date_word_start + len(date_words) + 5)
-                    context_words = words[context_start:context_end]
-                    context = ' '.join(context_words)
-                else:
-                    # Fallback to sentence fragment
-                    context_start = max(0, date_pos - 30)
-                    context_end = min(len(sentence_text), date_pos + len(date_text) + 30)
-                    context = sentence_text[context_start:context_end].strip()
-            else:
-                context = sentence_text[:50] + "..." if len(sentence_text) > 50 else sentence_text
+            # Position of the date in the sentence, straight from the entity's character offset
+            date_pos = ent.start_char - sent.start_char - (len(raw_sentence) - len(raw_sentence.lstrip()))
             
-            # Clean up context
-            context = re.sub(r'\s+', ' ', context).strip()
+            # Extract context with complete words (±5 words around the date)
+            words = sentence_text.split()
+            date_word_start = len(sentence_text[:date_pos].split())
+            if date_pos and not sentence_text[date_pos - 1].isspace():
+                date_word_start -= 1  # The date starts inside a word, e.g. "mid-2025"
+            context_start = max(0, date_word_start - 5)
+            context_end = min(len(words), date_word_start + len(date_text.split()) + 5)
+            context = ' '.join(words[context_start:context_end])
             
-            # Create meaningful description
-            description = create_date_description(date_text, sentence_text)
+            # Create meaningful description; both helpers share one lowercased copy
+            date_lower, sentence_lower = date_text.lower(), sentence_text.lower()
+            description = create_date_description(date_text, sentence_text, date_lower, sentence_lower)
             
             dates.append({
-                'date': ent.text,
+                'date': date_text,
                 'context': context,
                 'description': description,
                 'full_sentence': sentence_text,
-                'category': categorize_date(date_text, sentence_text)
+                'category': categorize_date(date_text, sentence_text, date_lower, sentence_lower)
             })
     
     return dates
 
+# Durations, ages and calendar dates, unioned into one alternation so the text is
+# scanned once. More specific phrases come first: at a given position the first
+# alternative that matches wins, so "within 30 days" is kept whole
+_MONTHS = r'(?:January|February|March|April|May|June|July|August|September|October|November|December)'
+_DATE_PATTERNS = [
+    r'\bup to \d+\s+days?\b',
+    r'\bat least \d+\s+days?\b',
+    r'\bwithin \d+\s+days?\b',
+    r'\banother \d+\s+days?\b',
+    r'\bbetween the ages? of \d+\b',
+    r'\bages? \d+ (?:and|to) \d+\b',
+    r'\b\d{1,2}\s+years?\s+old\b',
+    r'\b\d+\s+days?\b',
+    r'\b\d+\s+months?\b',
+]
+# Calendar dates (2025-01-31, January 31, 2025, 31 January 2025); matches are
+# checked with dateutil so impossible dates like 2025-02-30 are dropped
+_CALENDAR_DATE_PATTERNS = [
+    r'\b\d{4}-\d{2}-\d{2}\b',
+    r'\b' + _MONTHS + r'\s+\d{1,2},?\s+\d{4}\b',
+    r'\b\d{1,2}\s+' + _MONTHS + r'\s+\d{4}\b',
+]
+_DATE_RE = re.compile(
+    '|'.join([f'(?:{p})' for p in _DATE_PATTERNS]
+             + ['(?P<calendar>' + '|'.join(f'(?:{p})' for p in _CALENDAR_DATE_PATTERNS) + ')']),
+    re.IGNORECASE
+)
+
+def _is_calendar_date(date_text: str) -> bool:
+    """Check that a calendar date matched by regex is a real date"""
+    try:
+        dateutil_parser.parse(date_text)
+        return True
+    except (ValueError, OverflowError):
+        return False
+
 def extract_dates_fallback(text: str) -> List[Dict[str, str]]:
     """Fallback date extraction using regex when NLP model is not available"""
-    import re
-    
-    # Common date patterns
-    date_patterns = [
-        r'\b\d{1,2}\s+years?\s+old\b',
-        r'\b\d+\s+days?\b',
-        r'\b\d+\s+months?\b',
-        r'\bup to \d+\s+days?\b',
-        r'\bat least \d+\s+days?\b',
-        r'\bwithin \d+\s+days?\b',
-        r'\bbetween the ages? of \d+\b',
-        r'\bages? \d+ (?:and|to) \d+\b',
-        r'\banother \d+\s+days?\b'
-    ]
-    
     dates = []
-    sentences = text.split('.')
     
-    for pattern in date_patterns:
-        for match in re.finditer(pattern, text, re.IGNORECASE):
-            date_text = match.group()
-            
-            # Find which sentence contains this date
-            for sentence in sentences:
-                if date_text.lower() in sentence.lower():
-                    # Extract context with complete words
-                    words = sentence.split()
-                    date_word_idx = -1
-                    
-                    for i, word in enumerate(words):
-                        if any(date_word.lower() in word.lower() for date_word in date_text.split()):
-                            date_word_idx = i
-                            break
-                    
-                    if date_word_idx != -1:
-                        context_start = max(0, date_word_idx - 5)
-                        context_end = min(len(words), date_word_idx + 6)
-                        context = ' '.join(words[context_start:context_end])
-                    else:
-                        context = sentence[:80] + "..." if len(sentence) > 80 else sentence
-                    
-                    description = create_date_description(date_text, sentence)
-                    
-                    dates.append({
-                        'date': date_text,
-                        'context': context.strip(),
-                        'description': description,
-                        'full_sentence': sentence.strip(),
-                        'category': categorize_date(date_text, sentence)
-                    })
-                    break
+    for match in _DATE_RE.finditer(text):
+        date_text = match.group()
+        if match.group('calendar') and not _is_calendar_date(date_text):
+            continue
+        
+        # The containing sentence runs between the periods either side of the match
+        sent_start = text.rfind('.', 0, match.start()) + 1
+        sent_end = text.find('.', match.end())
+        sentence = text[sent_start:sent_end if sent_end != -1 else len(text)]
+        
+        # Extract context with complete words, counted from the match offset
+        words = sentence.split()
+        date_pos = match.start() - sent_start
+        date_word_idx = len(sentence[:date_pos].split())
+        if date_pos and not sentence[date_pos - 1].isspace():
+            date_word_idx -= 1  # The date starts inside a word, e.g. '"January 5, 2024'
+        context_start = max(0, date_word_idx - 5)
+        context_end = min(len(words), date_word_idx + 6)
+        context = ' '.join(words[context_start:context_end])
+        
+        date_lower, sentence_lower = date_text.lower(), sentence.lower()
+        description = create_date_description(date_text, sentence, date_lower, sentence_lower)
+        
+        dates.append({
+            'date': date_text,
+            'context': context.strip(),
+            'description': description,
+            'full_sentence': sentence.strip(),
+            'category': categorize_date(date_text, sentence, date_lower, sentence_lower)
+        })
     
     return dates
 
-def create_date_description(date_text: str, sentence: str) -> str:
+def create_date_description(date_text: str, sentence: str,
+                            date_lower: str = None, sentence_lower: str = None) -> str:
     """Create a meaningful description for the date based on context"""
-    date_lower = date_text.lower()
-    sentence_lower = sentence.lower()
+    if date_lower is None:
+        date_lower = date_text.lower()
+    if sentence_lower is None:
+        sentence_lower = sentence.lower()
     
     # Age requirements
     if 'years old' in date_lower or 'age' in sentence_lower:
@@ -374,10 +520,13 @@ def create_date_description(date_text: str, sentence: str) -> str:
     else:
         return f"Important timeframe: {date_text}"
 
-def categorize_date(date_text: str, sentence: str) -> str:
+def categorize_date(date_text: str, sentence: str,
+                    date_lower: str = None, sentence_lower: str = None) -> str:
     """Categorize the date into meaningful groups"""
-    date_lower = date_text.lower()
-    sentence_lower = sentence.lower()
+    if date_lower is None:
+        date_lower = date_text.lower()
+    if sentence_lower is None:
+        sentence_lower = sentence.lower()
     
     if 'years old' in date_lower or 'age' in sentence_lower:
         return "Age Requirements"
@@ -393,23 +542,21 @@ def categorize_date(date_text: str, sentence: str) -> str:
         return "General Timeframes"
 
 # Extract document title and type
-def extract_document_info(text: str, nlp) -> Dict[str, str]:
-    """Extract document title, type and purpose from the beginning of the document"""
+def extract_document_info(text: str, nlp, lazy_spacy: bool = False) -> Dict[str, str]:
+    """Extract document title, type and purpose from the beginning of the document
+
+    With lazy_spacy no trained component runs and organisations come from a regex heuristic.
+    """
     # Take first few paragraphs for analysis
     first_part = text[:1000]
-    doc = nlp(first_part)
-    
-    # Common legal document patterns
-    doc_type_patterns = {
-        'Terms of Service': r'terms?\s+of\s+(service|use)',
-        'Privacy Policy': r'privacy\s+policy',
-        'License Agreement': r'license\s+agreement',
-        'Service Agreement': r'service\s+agreement', 
-        'Terms and Conditions': r'terms?\s+and\s+conditions',
-        'User Agreement': r'user\s+agreement',
-        'Contract': r'contract|agreement',
-        'Policy': r'policy'
-    }
+    # Only sentences and entities are read here, so skip the dependency parser
+    # and take sentence boundaries from the rule-based sentencizer instead
+    doc = nlp.make_doc(first_part)
+    if not lazy_spacy:
+        for name, component in nlp.pipeline:
+            if name != "parser":
+                doc = component(doc)
+    doc = _SENTENCIZER(doc)
     
     document_type = "Legal Document"  # Default
     document_title = ""
@@ -418,8 +565,8 @@ def extract_document_info(text: str, nlp) -> Dict[str, str]:
     first_sentences = [sent.text for sent in list(doc.sents)[:5]]
     combined_text = ' '.join(first_sentences).lower()
     
-    for doc_type, pattern in doc_type_patterns.items():
-        if re.search(pattern, combined_text, re.IGNORECASE):
+    for doc_type, pattern in _DOC_TYPE_PATTERNS.items():
+        if pattern.search(combined_text):
             document_type = doc_type
             break
     
@@ -437,6 +584,8 @@ def extract_document_info(text: str, nlp) -> Dict[str, str]:
     if not document_title:
         # Look for organization names
         org_names = []
+        if lazy_spacy:
+            org_names = [match.group() for match in _ORG_RE.finditer(first_part)]
         for ent in doc.ents:
             if ent.label_ == "ORG" and len(ent.text) > 2:
                 org_names.append(ent.text)
@@ -597,7 +746,7 @@ def format_obligations_section(all_obligations: Dict[str, List[str]]) -> str:
             output.append("-" * len(party))
             for i, obligation in enumerate(obligations, 1):
                 # Clean up the obligation text
-                clean_obligation = re.sub(r'\s+', ' ', obligation).strip()
+                clean_obligation = _WS_RE.sub(' ', obligation).strip()
                 output.append(f"{i}. {clean_obligation}")
     
     return "\n".join(output)
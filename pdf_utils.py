@@ -1,9 +1,14 @@
-import PyPDF2
+import re
+import pypdfium2 as pdfium
+
+_WS_RE = re.compile(r'\s+')
 
 def extract_text_from_pdf(uploaded_file) -> str:
     """Extract text from an uploaded PDF file"""
-    pdf_reader = PyPDF2.PdfReader(uploaded_file)
-    text = ""
-    for page in pdf_reader.pages:
-        text += page.extract_text() or ""
-    return text
\ No newline at end of file
+    pdf = pdfium.PdfDocument(uploaded_file)
+    try:
+        # Collapse whitespace page by page so only compact text is held until the join
+        pages = [_WS_RE.sub(' ', page.get_textpage().get_text_range()) for page in pdf]
+    finally:
+        pdf.close()
+    return " ".join(pages)
\ No newline at end of file
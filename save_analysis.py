@@ -1,131 +1,164 @@
-from firebase_setup import db, auth
+from firebase_setup import db
+from auth import get_fresh_id_token
+from requests.exceptions import HTTPError
+import logging
 import time
 import re
-import streamlit as st
 
-def generate_analysis_name(analysis):
+logger = logging.getLogger(__name__)
+
+# Characters dropped from titles before they are used as database keys
+_TITLE_UNSAFE_RE = re.compile(r'[^a-zA-Z0-9\s]')
+_TITLE_UNSAFE_BYTES = bytes(c for c in range(128) if not (chr(c).isalnum() or chr(c).isspace()))
+_WS_RE = re.compile(r'\s+')
+
+# Reports longer than this are cut before saving (100KB limit)
+MAX_REPORT_CHARS = 100000
+_TRUNC_SUFFIX = "\n\n[Report truncated due to size limits]"
+
+def generate_analysis_name(analysis, now=None):
     """
-    Generate a simple name based on document title
+    Generate a simple name based on document title; now is a time.time() value to reuse
     """
     # Get document title from document_info
     doc_info = analysis.get("document_info", {})
     title = doc_info.get("title", "")
     
     if title and title != "Legal Document":
-        # Clean the title for use as filename
-        clean_title = re.sub(r'[^a-zA-Z0-9\s]', '', title)
-        clean_title = re.sub(r'\s+', '_', clean_title.strip())[:50]  # Limit length
+        # Clean the title for use as filename; ASCII titles (the usual case) go
+        # through a C-level byte deletion, others keep \s's Unicode whitespace rules
+        if title.isascii():
+            clean_title = title.encode('ascii').translate(None, _TITLE_UNSAFE_BYTES).decode('ascii')
+        else:
+            clean_title = _TITLE_UNSAFE_RE.sub('', title)
+        clean_title = _WS_RE.sub('_', clean_title.strip())[:50]  # Limit length
     else:
         clean_title = "Legal_Document"
     
     # Add timestamp to avoid duplicates
-    timestamp = time.strftime("%Y%m%d_%H%M", time.localtime())
+    timestamp = time.strftime("%Y%m%d_%H%M", time.localtime(now))
     
     return f"{clean_title}_{timestamp}"
 
-def refresh_user_token(user):
-    """Refresh the user's ID token if it's expired"""
+def _is_unauthorized(error):
+    """True if a pyrebase HTTPError wraps a 401 response"""
+    response = getattr(error.args[0], "response", None) if error.args else None
+    return getattr(response, "status_code", None) == 401
+
+def _with_fresh_token(user, request):
+    """Run request(token) with a fresh ID token, force-refreshing and retrying once on 401"""
+    stale_token = user.get("idToken")
+    token = get_fresh_id_token(user)
+    try:
+        return request(token)
+    except HTTPError as e:
+        # A token refreshed just now gets no second refresh: that would save the
+        # cookie component again under the same key in this run and raise
+        if not _is_unauthorized(e) or token != stale_token:
+            raise
+        return request(get_fresh_id_token(user, force=True))
+
+def get_user_id(user):
+    """Database key for the user's analyses"""
+    # Fallback: use email as identifier (not ideal but functional)
+    return user.get('localId') or user.get('email', 'unknown_user')
+
+def _build_save_data(name, analysis, final_report=None, now=None):
+    """Minimal record stored for one analysis"""
+    # Handle large reports by truncating if necessary
+    if final_report and len(final_report) > MAX_REPORT_CHARS:
+        final_report = final_report[:MAX_REPORT_CHARS] + _TRUNC_SUFFIX
+        logger.warning("Report truncated due to size")
+    
+    return {
+        "name": name,
+        "timestamp": int(time.time() if now is None else now),
+        "document_info": analysis.get("document_info", {}),
+        "summary": {
+            "total_clauses": len(analysis.get("clauses", [])),
+            "total_dates": len(analysis.get("all_dates", [])),
+            "total_parties": len(analysis.get("all_obligations", {})),
+            "document_length": analysis.get("metadata", {}).get("length", 0)
+        },
+        "final_report": final_report or "No report generated"
+    }
+
+def save_analyses(user, analyses):
+    """Save several (analysis, final_report) pairs in one multi-path database update"""
+    if not user.get('idToken'):
+        raise Exception("No authentication token found - please log in again")
+    
+    batch = {}
+    now = time.time()
+    for analysis, final_report in analyses:
+        name = generate_analysis_name(analysis, now)
+        # Same title saved within the same minute: keep both
+        suffix = 2
+        unique_name = name
+        while unique_name in batch:
+            unique_name = f"{name}_{suffix}"
+            suffix += 1
+        batch[unique_name] = _build_save_data(unique_name, analysis, final_report, now)
+    
+    if not batch:
+        return []
+    
+    # The report dominates the payload; str(batch) would copy every record just to log it
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Data prepared for saving, report size: %d characters",
+                     sum(len(d['final_report']) for d in batch.values()))
+    
+    # Save to database with error handling
+    user_id = get_user_id(user)
     try:
-        # Try to get account info to check if token is valid
-        auth.get_account_info(user.get('idToken'))
-        return user  # Token is still valid
-    except:
-        # Token is expired, need to refresh from session/cookies
-        # This would normally be handled by the auth system
-        # For now, return the user as-is and let the error bubble up
-        return user
+        logger.debug("Attempting to save to database...")
+        result = _with_fresh_token(user, lambda token: db.child("analyses").child(user_id).update(batch, token))
+        logger.debug("Database save result: %s", result)
+    except Exception as db_error:
+        # Only translated and re-raised here; the caller reports it once
+        logger.debug("Database error occurred: %s", db_error)
+        # If it's an auth error, suggest re-login
+        if "auth" in str(db_error).lower() or "unauthorized" in str(db_error).lower() or "permission" in str(db_error).lower():
+            raise Exception("Authentication expired - please log out and log back in")
+        else:
+            raise Exception(f"Database error: {str(db_error)}")
+    return list(batch)
 
 def save_analysis(user, analysis, final_report=None):
-    """Save analysis with final report"""
-    print("=== SAVE_ANALYSIS FUNCTION CALLED ===")
-    print(f"User provided: {user is not None}")
-    print(f"Analysis provided: {analysis is not None}")
-    print(f"Final report provided: {final_report is not None}")
+    """Save analysis with final report; failures are raised for the caller to log and show"""
+    logger.debug("save_analysis called: user=%s analysis=%s final_report=%s",
+                 user is not None, analysis is not None, final_report is not None)
     
     try:
-        # Ensure we have a fresh token
-        user = refresh_user_token(user)
-        
-        # Get user ID with fallback
-        user_id = user.get('localId')
-        if not user_id:
-            # Fallback: use email as identifier (not ideal but functional)
-            user_id = user.get('email', 'unknown_user')
-        
-        print(f"User ID: {user_id}")
-        
-        # Check if token exists
-        token = user.get('idToken')
-        if not token:
-            raise Exception("No authentication token found - please log in again")
-        
-        print("Token validated successfully")
-        
-        name = generate_analysis_name(analysis)
-        print(f"Generated name: {name}")
-        
-        # Handle large reports by truncating if necessary
-        if final_report and len(final_report) > 100000:  # 100KB limit
-            final_report = final_report[:100000] + "\n\n[Report truncated due to size limits]"
-            print("Report truncated due to size")
-        
-        # Prepare minimal data to save
-        save_data = {
-            "name": name,
-            "timestamp": int(time.time()),
-            "document_info": analysis.get("document_info", {}),
-            "summary": {
-                "total_clauses": len(analysis.get("clauses", [])),
-                "total_dates": len(analysis.get("all_dates", [])),
-                "total_parties": len(analysis.get("all_obligations", {})),
-                "document_length": analysis.get("metadata", {}).get("length", 0)
-            },
-            "final_report": final_report or "No report generated"
-        }
-        
-        print(f"Data prepared for saving, size: {len(str(save_data))} characters")
-        
-        # Save to database with error handling
-        try:
-            print("Attempting to save to database...")
-            result = db.child("analyses").child(user_id).child(name).set(save_data, token)
-            print(f"Database save result: {result}")
-            print("=== SAVE SUCCESSFUL ===")
-            return True
-        except Exception as db_error:
-            print(f"Database error occurred: {db_error}")
-            # If it's an auth error, suggest re-login
-            if "auth" in str(db_error).lower() or "unauthorized" in str(db_error).lower() or "permission" in str(db_error).lower():
-                raise Exception("Authentication expired - please log out and log back in")
-            else:
-                raise Exception(f"Database error: {str(db_error)}")
-        
+        # A batch of one, so single saves and bulk saves share one write path
+        name, = save_analyses(user, [(analysis, final_report)])
+        logger.debug("Saved analysis as %s", name)
+        return True
     except Exception as e:
-        error_msg = f"Error saving analysis: {str(e)}"
-        print(f"=== SAVE ERROR: {error_msg} ===")
-        raise Exception(error_msg)
+        raise Exception(f"Error saving analysis: {str(e)}")
+
+def fetch_saved_analyses(user_id, id_token):
+    """Read all saved analyses for user_id with an already fresh token; raises on failure"""
+    analyses = db.child("analyses").child(user_id).get(id_token)
+    # each() builds a fresh wrapper list, and is None when nothing is saved
+    return [item.val() for item in analyses.each() or []]
+
+def get_saved_analyses(user, fetch=fetch_saved_analyses):
+    """Get all saved analyses for a user
 
-def get_saved_analyses(user):
-    """Get all saved analyses for a user"""
+    fetch(user_id, id_token) does the read. The token is refreshed before it is
+    called, so fetch itself never touches the user dict or the auth cookie.
+    """
     try:
         # Get user ID with fallback
-        user_id = user.get('localId')
-        if not user_id:
-            # Fallback: use email as identifier (not ideal but functional)
-            user_id = user.get('email', 'unknown_user')
+        user_id = get_user_id(user)
         
         # Get token for authenticated request
-        token = user.get('idToken')
-        if not token:
+        if not user.get('idToken'):
             return []
         
-        analyses = db.child("analyses").child(user_id).get(token)
-        
-        if analyses.each():
-            return [item.val() for item in analyses.each()]
-        else:
-            return []
+        return _with_fresh_token(user, lambda token: fetch(user_id, token))
             
     except Exception as e:
-        print(f"Error getting saved analyses: {str(e)}")
+        logger.error("Error getting saved analyses: %s", e)
         return []
\ No newline at end of file
@@ -0,0 +1,49 @@
+import pytest
+
+# main imports the auth and Firebase modules at load
+pytest.importorskip("streamlit")
+pytest.importorskip("pyrebase")
+pytest.importorskip("streamlit_cookies_manager")
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import auth
+import save_analysis
+
+
+@pytest.fixture
+def app(monkeypatch):
+    # load_session waits on the browser's cookies, which AppTest never sends
+    monkeypatch.setattr(auth, "load_session", lambda: None)
+    import main
+
+    store = []
+    monkeypatch.setattr(main, "fetch_saved_analyses", lambda user_id, id_token: list(store))
+    monkeypatch.setattr(save_analysis, "get_fresh_id_token", lambda user, force=False: user["idToken"])
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    return store
+
+
+def _list_saved():
+    import streamlit as st
+    import main
+    st.session_state["listed"] = main._saved_analyses({"localId": "user-1", "idToken": "token"})
+
+
+def _save():
+    import main
+    main._invalidate_saved_analyses("user-1")
+
+
+def test_save_is_listed_in_a_fresh_session(app):
+    first = AppTest.from_function(_list_saved).run()
+    assert first.session_state["listed"] == []
+
+    # Another session saves a report; the cached listing above predates it
+    app.append({"name": "Lease_20240105_1200"})
+    AppTest.from_function(_save).run()
+
+    fresh = AppTest.from_function(_list_saved).run()
+    assert fresh.session_state["listed"] == [{"name": "Lease_20240105_1200"}]
@@ -0,0 +1,108 @@
+import pytest
+
+# nlp_utils imports spaCy, numpy and pyahocorasick at module load
+pytest.importorskip("spacy")
+pytest.importorskip("ahocorasick")
+
+import spacy
+
+from nlp_utils import (
+    _ORG_RE, classify_clause, extract_dates, extract_dates_fallback, extract_document_info,
+    extract_important_points,
+)
+
+
+def test_fallback_date_context_after_punctuation():
+    text = 'Notice must be given by the tenant no later than "January 5, 2024" to the landlord'
+    dates = extract_dates_fallback(text)
+
+    assert [d["date"] for d in dates] == ["January 5, 2024"]
+    # Five words before the date's first word ('"January') and six words from it
+    assert dates[0]["context"] == 'the tenant no later than "January 5, 2024" to the landlord'
+
+
+def test_fallback_date_context_after_space():
+    text = "The customer must pay each invoice within 30 days of receipt"
+    dates = extract_dates_fallback(text)
+
+    assert [d["date"] for d in dates] == ["within 30 days"]
+    assert dates[0]["context"] == "customer must pay each invoice within 30 days of receipt"
+
+
+def test_org_regex_skips_preamble_and_headings():
+    assert _ORG_RE.findall("WHEREAS The Company agrees to pay the fees.") == []
+    assert _ORG_RE.findall("Services Agreement The Company shall pay the fees.") == []
+    assert _ORG_RE.findall("made between Acme Widgets Inc. and Beta Holdings, LLC") == [
+        "Acme Widgets Inc.", "Beta Holdings, LLC"
+    ]
+
+
+def test_lazy_document_title_ignores_the_company():
+    info = extract_document_info("WHEREAS The Company shall pay the fees on time.",
+                                 spacy.blank("en"), lazy_spacy=True)
+
+    assert info["title"] == "Legal Document"
+
+
+@pytest.fixture
+def nlp():
+    # Tokenizer plus punctuation sentences; enough for the lexical and date extractors
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    return nlp
+
+
+def test_important_points_token_and_phrase_rules(nlp):
+    doc = nlp("The tenant shall pay rent. The weather is nice. Notwithstanding the above, rent is due. "
+              "See the NOTICE below. It is in the USA.")
+
+    # Modal verb, legal phrase and an all-caps term longer than three letters; "USA" is too short
+    assert extract_important_points(doc) == [
+        "The tenant shall pay rent.",
+        "Notwithstanding the above, rent is due.",
+        "See the NOTICE below.",
+    ]
+
+
+def test_important_points_keeps_the_first_five(nlp):
+    doc = nlp(" ".join(f"Party {i} must pay." for i in range(7)))
+
+    assert extract_important_points(doc) == [f"Party {i} must pay." for i in range(5)]
+
+
+def _with_dates(doc, *date_texts):
+    doc.ents = [doc.char_span(doc.text.index(text), doc.text.index(text) + len(text), label="DATE")
+                for text in date_texts]
+    return doc
+
+
+def test_dates_are_matched_to_their_sentences(nlp):
+    doc = _with_dates(nlp("The lease starts on January 5, 2024 for the tenant. "
+                          "Rent is paid monthly. The landlord may end it after 30 days of notice."),
+                      "January 5, 2024", "30 days")
+    dates = extract_dates(doc)
+
+    assert [d["date"] for d in dates] == ["January 5, 2024", "30 days"]
+    assert dates[0]["full_sentence"] == "The lease starts on January 5, 2024 for the tenant."
+    assert dates[0]["context"] == "The lease starts on January 5, 2024 for the tenant."
+    assert dates[1]["full_sentence"] == "The landlord may end it after 30 days of notice."
+    assert dates[1]["context"] == "landlord may end it after 30 days of notice."
+
+
+def test_date_context_after_punctuation(nlp):
+    doc = _with_dates(nlp('Notice must be given by the tenant no later than "January 5, 2024" to the landlord.'),
+                      "January 5, 2024")
+    dates = extract_dates(doc)
+
+    # The date's first word is '"January', so the five words before it start at "the"
+    assert dates[0]["context"] == 'the tenant no later than "January 5, 2024" to the landlord.'
+
+
+def test_classify_clause_breaks_ties_in_table_order():
+    # "fee" (Payment Terms) and "confidential" score one each; Confidentiality is listed first
+    assert classify_clause("The fee is confidential.")["type"] == "Confidentiality"
+
+
+def test_classify_clause_counts_overlapping_keywords():
+    # "shall mean" also contains "shall", so Obligations (shall, duty) beats Definitions
+    assert classify_clause("Payment shall mean the duty.")["type"] == "Obligations"
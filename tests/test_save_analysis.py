@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+import pytest
+
+# save_analysis imports the Firebase client and Streamlit at load
+pytest.importorskip("streamlit")
+pytest.importorskip("pyrebase")
+pytest.importorskip("streamlit_cookies_manager")
+
+from requests.exceptions import HTTPError
+
+import auth
+import save_analysis
+from save_analysis import save_analyses
+
+ANALYSIS = {"document_info": {"title": "Lease Agreement"}, "clauses": []}
+
+
+@pytest.fixture(autouse=True)
+def no_refresh(monkeypatch):
+    def refresh(user, force=False):
+        raise AssertionError("token refresh should not be reached without an idToken")
+    monkeypatch.setattr(save_analysis, "get_fresh_id_token", refresh)
+
+
+def test_single_save_without_token_asks_to_log_in():
+    with pytest.raises(Exception, match="No authentication token found - please log in again"):
+        save_analysis.save_analysis({"localId": "user-1"}, ANALYSIS, "report")
+
+
+def test_bulk_save_without_token_asks_to_log_in():
+    with pytest.raises(Exception, match="No authentication token found - please log in again"):
+        save_analyses({"localId": "user-1", "idToken": ""}, [(ANALYSIS, "report"), (ANALYSIS, None)])
+
+
+class _FakeCookieManager(dict):
+    saves = 0
+
+    def save(self):
+        self.saves += 1
+
+
+def test_401_after_refresh_does_not_refresh_again(monkeypatch):
+    # Refreshing writes the cookie through a keyed component, which can only be saved once per run
+    manager = _FakeCookieManager(refreshToken="refresh-1")
+    monkeypatch.setattr(auth, "_get_cookies", lambda: auth._BatchedCookies(manager))
+    refreshes = []
+
+    def refresh(refresh_token):
+        refreshes.append(refresh_token)
+        return {"idToken": f"token-{len(refreshes)}", "refreshToken": f"refresh-{len(refreshes) + 1}"}
+
+    monkeypatch.setattr(auth.auth, "refresh", refresh)
+    monkeypatch.setattr(save_analysis, "get_fresh_id_token", auth.get_fresh_id_token)
+
+    def request(token):
+        raise HTTPError(SimpleNamespace(response=SimpleNamespace(status_code=401)), "expired")
+
+    # "stale" isn't a JWT, so it counts as expiring and is refreshed before the request
+    with pytest.raises(HTTPError):
+        save_analysis._with_fresh_token({"idToken": "stale"}, request)
+
+    assert refreshes == ["refresh-1"]
+    assert manager.saves == 1